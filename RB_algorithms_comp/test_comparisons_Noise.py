@@ -6,15 +6,13 @@ Created on Fri Mar 26 01:29:15 2021
 """
 
 
+import os
 import numpy as np
 import pickle
-
-import pyro
-pyro.enable_validation(True)  # can help with debugging
-pyro.set_rng_seed(1)
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from algorithms.PyBobyqa_wrapped.Wrapper_for_pybobyqa import PyBobyqaWrapper
-from algorithms.Bayesian_opt_Pyro.utilities_full import BayesOpt
 from algorithms.nesterov_random.nesterov_random import nesterov_random
 from algorithms.simplex.simplex_method import simplex_method
 from algorithms.CUATRO.CUATRO import CUATRO
@@ -29,7 +27,6 @@ from test_functions import rosenbrock_constrained, quadratic_constrained
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-import itertools
 import pandas as pd
 import pickle
 
@@ -53,18 +50,26 @@ class RB:
             return np.product(np.array(temporary), axis = 0)
 
 
+def pad_from_list(solutions_list, key, fill):
+    # stacks solutions_list[i][key] along a new first axis, padded with fill
+    # to the longest run
+    arrays = [np.asarray(sol[key], dtype = float) for sol in solutions_list]
+    M = max(len(a) for a in arrays)
+    padded = np.full((len(arrays), M) + arrays[0].shape[1:], fill, dtype = float)
+    for i, a in enumerate(arrays):
+        padded[i, :len(a)] = a
+    return padded
+
+def index_at_samples(solutions_list):
+    x_ind = pad_from_list(solutions_list, 'samples_at_iteration', np.inf)
+    # last iteration with at most j+1 samples, the first one if none
+    ind = np.sum(x_ind[:, None, :] <= np.arange(1, 101)[:, None], axis = -1) - 1
+    return np.maximum(ind, 0)
+
 def average_from_list(solutions_list):
-    N = len(solutions_list)
-    f_best_all = np.zeros((N, 100))
-    for i in range(N):
-        f_best = np.array(solutions_list[i]['f_best_so_far'])
-        x_ind = np.array(solutions_list[i]['samples_at_iteration'])
-        for j in range(100):
-            ind = np.where(x_ind <= j+1)
-            if len(ind[0]) == 0:
-                f_best_all[i, j] = f_best[0]
-            else:
-                f_best_all[i, j] = f_best[ind][-1]
+    ind = index_at_samples(solutions_list)
+    f_best = pad_from_list(solutions_list, 'f_best_so_far', 0)
+    f_best_all = np.take_along_axis(f_best, ind, axis = 1)
     f_median = np.median(f_best_all, axis = 0)
     # f_av = np.average(f_best_all, axis = 0)
     # f_std = np.std(f_best_all, axis = 0)
@@ -73,21 +78,9 @@ def average_from_list(solutions_list):
     return f_best_all, f_median, f_min, f_max
 
 def median_from_list(solutions_list):
-    N = len(solutions_list)
-    f_best_all = np.zeros((N, 100))
-    x_best_all = np.zeros((N, 100, len(solutions_list[0]['x_best_so_far'][0])))
-    for i in range(N):
-        f_best = np.array(solutions_list[i]['f_best_so_far'])
-        x_best = np.array(solutions_list[i]['x_best_so_far'])
-        x_ind = np.array(solutions_list[i]['samples_at_iteration'])
-        for j in range(100):
-            ind = np.where(x_ind <= j+1)
-            if len(ind[0]) == 0:
-                f_best_all[i, j] = f_best[0]
-                x_best_all[i, j, :] = x_best[0]
-            else:
-                f_best_all[i, j] = f_best[ind][-1]
-                x_best_all[i, j, :] = x_best[ind][-1]
+    ind = index_at_samples(solutions_list)
+    x_best = pad_from_list(solutions_list, 'x_best_so_far', 0)
+    x_best_all = np.take_along_axis(x_best, ind[:, :, None], axis = 1)
     x_median = np.median(x_best_all, axis = 0)
     return x_median
 
@@ -113,16 +106,49 @@ def trust_fig(oracle, bounds):
     
     return ax, fig
 
-def Problem_rosenbrock(x, noise_std, N_SAA):
-    f_SAA = 0
-    g_SAA1, g_SAA2 = - np.inf, -np.inf
+def SAA_noise(noise):
+    # noise of shape (..., N_SAA, 3): SAA mean for f, SAA max for g1 and g2
+    return noise[...,0].mean(axis = -1), noise[...,1:].max(axis = -2)
+
+class NoisePool:
+    '''
+    Noise of one optimisation run drawn up front: each call of
+    Problem_rosenbrock consumes the next row (SAA mean of the objective noise,
+    SAA max of the constraint noise) instead of sampling on every call.
+    '''
+    def __init__(self, noise_std, N_SAA, n_calls, seed):
+        self.rng = np.random.default_rng(seed)
+        self.noise_std = np.asarray(noise_std) ; self.N_SAA = N_SAA
+        self.n_calls = n_calls ; self.k = 0
+        self.f_noise, self.g_noise = self.draw()
+    def draw(self):
+        return SAA_noise(self.rng.normal(0, self.noise_std, \
+                                         (self.n_calls, self.N_SAA, 3)))
+    def next(self):
+        if self.k == len(self.f_noise):
+            # optimiser went over its budget, so draw another block
+            f_noise, g_noise = self.draw()
+            self.f_noise = np.concatenate((self.f_noise, f_noise))
+            self.g_noise = np.concatenate((self.g_noise, g_noise))
+        self.k += 1
+        return self.f_noise[self.k-1], self.g_noise[self.k-1]
+
+_default_rng = np.random.default_rng(1)
+
+def Problem_rosenbrock(x, noise_std, N_SAA, noise_pool = None, rng = None):
     f1 = rosenbrock_constrained.rosenbrock_f
     g1 = rosenbrock_constrained.rosenbrock_g1
     g2 = rosenbrock_constrained.rosenbrock_g2
-    for i in range(N_SAA):
-        f_SAA += (f1(x) + np.random.normal(0, noise_std[0]))/N_SAA
-        g_SAA1 = max(g1(x) + np.random.normal(0, noise_std[1]), g_SAA1)
-        g_SAA2 = max(g2(x) + np.random.normal(0, noise_std[2]), g_SAA2)
+    # noise is additive, so the SAA mean/max only act on the noise draws
+    if noise_pool is None:
+        if rng is None:
+            rng = _default_rng
+        noise_f, noise_g = SAA_noise(rng.normal(0, noise_std, (N_SAA, 3)))
+    else:
+        noise_f, noise_g = noise_pool.next()
+    f_SAA = f1(x) + noise_f
+    g_SAA1 = g1(x) + noise_g[0]
+    g_SAA2 = g2(x) + noise_g[1]
 
     return f_SAA, [g_SAA1, g_SAA2]
 
@@ -134,371 +160,242 @@ for i in range(n_noise):
 bounds = np.array([[-1.5,1.5],[-1.5,1.5]])
 x0 = np.array([-0.5,1.5])
 
-max_f_eval = 100 ; N_SAA = 1
-# max_f_eval = 50 ; N_SAA = 2
-max_it = 100
-
-
 N_samples = 20
-RBnoise_list_pybbqa = []
-RBconstraint_list_pybbqa = []
-for i in range(n_noise):
-    print('Iteration ', i, ' of Py-BOBYQA')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        sol = PyBobyqaWrapper().solve(f, x0, bounds=bounds.T, \
-                                      maxfun= max_f_eval, constraints=2, \
-                                      seek_global_minimum = True, \
-                                      objfun_has_noise = True)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoise_list_pybbqa.append(best)
-    RBconstraint_list_pybbqa.append(best_constr)
-
-# N_SAA = 1
-N_samples = 20
-RBnoise_list_SQSF = []
-RBconstraint_list_SQSF = []
-for i in range(n_noise):
-    print('Iteration ', i, ' of SQSnobfit')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        sol = SQSnobFitWrapper().solve(f, x0, bounds, \
-                                    maxfun = max_f_eval, constraints=2)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoise_list_SQSF.append(best)
-    RBconstraint_list_SQSF.append(best_constr)
-    
-# N_SAA = 1
-N_samples = 20
-RBnoise_list_DIRECT = []
-RBconstraint_list_DIRECT = []
-init_radius = 0.1
+method_names = ['Py-BOBYQA', 'Snobfit', 'DIRECT', 'CUATRO_g', 'Bayes. Opt.']
+init_radius = 2
 boundsDIR = np.array([[-1.5,1],[-1,1.5]])
-for i in range(n_noise):
-    print('Iteration ', i, ' of DIRECT')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
+
+# wrappers are built once per process and reused for every trial
+_pybbqa = PyBobyqaWrapper()
+_sqsf = SQSnobFitWrapper()
+_direct = DIRECTWrapper()
+
+
+def _run_trial(args):
+    method, i, N_SAA, max_f_eval, j = args
+    np.random.seed(j)
+    noise_std = noise_matrix[i]
+    noise_pool = NoisePool(noise_std, N_SAA, max_f_eval, [i, j])
+    f = partial(Problem_rosenbrock, noise_std = noise_std, N_SAA = N_SAA, \
+                noise_pool = noise_pool)
+    if method == 'pybbqa':
+        sol = _pybbqa.solve(f, x0, bounds=bounds.T, \
+                            maxfun= max_f_eval, constraints=2, \
+                            seek_global_minimum = True, \
+                            objfun_has_noise = True)
+    elif method == 'SQSF':
+        sol = _sqsf.solve(f, x0, bounds, \
+                          maxfun = max_f_eval, constraints=2)
+    elif method == 'DIRECT':
         DIRECT_f = lambda x, grad: f(x)
-        sol = DIRECTWrapper().solve(DIRECT_f, x0, boundsDIR, \
-                                    maxfun = max_f_eval, constraints=2)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoise_list_DIRECT.append(best)
-    RBconstraint_list_DIRECT.append(best_constr)
-    
-# N_SAA = 1
-N_samples = 20
-RBnoise_list_CUATROg = []
-RBconstraint_list_CUATROg = []
-init_radius = 2
-for i in range(n_noise):
-    print('Iteration ', i, ' of CUATRO_g')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
+        sol = _direct.solve(DIRECT_f, x0, boundsDIR, \
+                            maxfun = max_f_eval, constraints=2)
+    elif method == 'CUATROg':
         sol = CUATRO(f, x0, init_radius, bounds = bounds, max_f_eval = max_f_eval, \
                           N_min_samples = 15, tolerance = 1e-10,\
                           beta_red = 0.9, rnd = j, method = 'global', \
                           constr_handling = 'Discrimination')
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoise_list_CUATROg.append(best)
-    RBconstraint_list_CUATROg.append(best_constr)
+    _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
+    return sol['f_best_so_far'][-1], np.sum(np.maximum(g, 0))
+
+def run_noise_study(method, N_SAA, max_f_eval):
+    # results are pickled, so re-running the script to tweak the plots does
+    # not repeat the optimisations (delete the file to run them again)
+    file = '%sRB_listNoise_SAA%d_feval%d_ns%d_nn%d.pickle' % \
+           (method, N_SAA, max_f_eval, N_samples, n_noise)
+    if os.path.exists(file):
+        with open(file, 'rb') as handle:
+            return pickle.load(handle)
+    # the N_samples replicates at each noise level are independent trials
+    print('Running ', n_noise*N_samples, ' trials of ', method)
+    trials = [(method, i, N_SAA, max_f_eval, j) \
+              for i in range(n_noise) for j in range(N_samples)]
+    noise_list = np.empty((n_noise, N_samples))
+    constraint_list = np.empty((n_noise, N_samples))
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for (_, i, _, _, j), (f_best, g_viol) in zip(trials, pool.map(_run_trial, trials)):
+            noise_list[i, j] = f_best
+            constraint_list[i, j] = g_viol
+    with open(file, 'wb') as handle:
+        pickle.dump((noise_list, constraint_list), handle, protocol=pickle.HIGHEST_PROTOCOL)
+    return noise_list, constraint_list
+
+def plot_noise_study(df, file_convergence, file_constraints):
+    # both metrics are plotted from one long-format frame, one figure each
+    long = df.melt(id_vars = ["Noise standard deviation", 'Method'], \
+                   value_vars = ['Best function evaluation', "Constraint violation"], \
+                   var_name = 'metric')
+    files = {'Best function evaluation': file_convergence, \
+             "Constraint violation": file_constraints}
+    for metric, data in long.groupby('metric'):
+        plt.figure()
+        if metric == "Constraint violation":
+            ax = sns.boxplot(x = "Noise standard deviation", y = 'value', \
+                             hue = "Method", data = data, palette = "muted", fliersize = 0)
+            ax = sns.stripplot(x = "Noise standard deviation", y = 'value', \
+                               hue = "Method", data = data, palette = "muted", dodge = True)
+            plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
+        else:
+            ax = sns.boxplot(x = "Noise standard deviation", y = 'value', \
+                             hue = "Method", data = data, palette = "muted")
+            plt.legend([])
+        plt.ylabel(metric)
+        plt.tight_layout()
+        plt.savefig(files[metric], format = "svg")
+        plt.show()
+        plt.close()
+
+
+if __name__ == '__main__':
+    max_f_eval = 100 ; N_SAA = 1
+    # max_f_eval = 50 ; N_SAA = 2
+    max_it = 100
+
+    RBnoise_list_pybbqa, RBconstraint_list_pybbqa = run_noise_study('pybbqa', N_SAA, max_f_eval)
+    RBnoise_list_SQSF, RBconstraint_list_SQSF = run_noise_study('SQSF', N_SAA, max_f_eval)
+    RBnoise_list_DIRECT, RBconstraint_list_DIRECT = run_noise_study('DIRECT', N_SAA, max_f_eval)
+    RBnoise_list_CUATROg, RBconstraint_list_CUATROg = run_noise_study('CUATROg', N_SAA, max_f_eval)
     
 
-with open('BayesRB_listNoiseConv.pickle', 'rb') as handle:
-    RBnoise_list_Bayes = pickle.load(handle)
-    
-with open('BayesRB_listNoiseConstr.pickle', 'rb') as handle:
-    RBconstraint_list_Bayes = pickle.load(handle)
-
-
-noise = ['%.3f' % noise_matrix[i][0] for i in range(n_noise)]
-noise_labels = [[noise[i]]*N_samples for i in range(n_noise)]
-
-
-convergence = list(itertools.chain(*RBnoise_list_pybbqa)) + \
-              list(itertools.chain(*RBnoise_list_SQSF)) + \
-              list(itertools.chain(*RBnoise_list_DIRECT)) + \
-              list(itertools.chain(*RBnoise_list_CUATROg)) + \
-              list(itertools.chain(*RBnoise_list_Bayes))
-              
-constraints = list(itertools.chain(*RBconstraint_list_pybbqa)) + \
-              list(itertools.chain(*RBconstraint_list_SQSF)) + \
-              list(itertools.chain(*RBconstraint_list_DIRECT)) + \
-              list(itertools.chain(*RBconstraint_list_CUATROg)) + \
-              list(itertools.chain(*RBconstraint_list_Bayes))   
-              
-noise = list(itertools.chain(*noise_labels))*5
-method = ['Py-BOBYQA']*int(len(noise)/5) + ['Snobfit']*int(len(noise)/5) + \
-          ['DIRECT']*int(len(noise)/5) + ['CUATRO_g']*int(len(noise)/5) + \
-           ['Bayes. Opt.']*int(len(noise)/5)   
-
-data = {'Best function evaluation': convergence, \
-        "Constraint violation": constraints, \
-        "Noise standard deviation": noise, \
-        'Method': method}
-df = pd.DataFrame(data)
-
-
-plt.rcParams["font.family"] = "Times New Roman"
-ft = int(15)
-font = {'size': ft}
-plt.rc('font', **font)
-params = {'legend.fontsize': 12.5,
-              'legend.handlelength': 1.2}
-plt.rcParams.update(params)
-
-
-ax = sns.boxplot(x = "Noise standard deviation", y = "Best function evaluation", hue = "Method", data = df, palette = "muted")
-# plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-plt.legend([])
-plt.tight_layout()
-plt.savefig('Publication plots format/RB_feval100Convergence.svg', format = "svg")
-plt.show()
-# ax.set_ylim([0.1, 10])
-# ax.set_yscale("log")
-plt.clf()
-
-
-min_list = np.array([np.min([np.min(RBnoise_list_pybbqa[i]), 
-                  np.min(RBnoise_list_SQSF[i]),
-                  np.min(RBnoise_list_DIRECT[i]), 
-                  np.min(RBnoise_list_CUATROg[i]), 
-                  np.min(RBnoise_list_Bayes[i])]) for i in range(n_noise)])
-
-convergence_test = list(itertools.chain(*np.array(RBnoise_list_pybbqa) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoise_list_SQSF) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoise_list_DIRECT) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoise_list_CUATROg) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoise_list_Bayes) - min_list.reshape(6,1)))
+    with open('BayesRB_listNoiseConv.pickle', 'rb') as handle:
+        RBnoise_list_Bayes = pickle.load(handle)
     
+    with open('BayesRB_listNoiseConstr.pickle', 'rb') as handle:
+        RBconstraint_list_Bayes = pickle.load(handle)
 
-data_test = {'Best function evaluation': convergence_test, \
-             "Constraint violation": constraints, \
-             "Noise standard deviation": noise, \
-             'Method': method}
 
-df_test = pd.DataFrame(data_test)
-    
-ax = sns.boxplot(x = "Noise standard deviation", y = 'Best function evaluation', hue = "Method", data = df_test, palette = "muted")
-# plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-# plt.legend([])
-plt.legend(bbox_to_anchor=(0,1.02,1,0.2), loc="lower left",
-                mode="expand", borderaxespad=0, ncol=3)
-plt.tight_layout()
-plt.ylabel(r'$f_{best, sample}$ - $f_{opt, noise}$')
-plt.savefig('Publication plots format/RB_feval100ConvergenceLabel.svg', format = "svg")
-plt.show()
-plt.clf()
-
-ax = sns.boxplot(x = "Noise standard deviation", y = "Constraint violation", \
-                    hue = "Method", data = df, palette = "muted", fliersize = 0)
-ax = sns.stripplot(x = "Noise standard deviation", y = "Constraint violation", \
-                    hue = "Method", data = df, palette = "muted", dodge = True)
-plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-plt.tight_layout()
-plt.savefig('Publication plots format/RB_feval100Constraints.svg', format = "svg")
-plt.show()
-plt.clf()
-
-
-max_f_eval = 50 ; N_SAA = 2
-max_it = 100
+    noise = ['%.3f' % noise_matrix[i][0] for i in range(n_noise)]
 
+    # shape (method, noise level, sample), flattened in that order below
+    RBnoise_list_all = np.array([RBnoise_list_pybbqa, RBnoise_list_SQSF, \
+                                 RBnoise_list_DIRECT, RBnoise_list_CUATROg, \
+                                 RBnoise_list_Bayes])
+    RBconstraint_list_all = np.array([RBconstraint_list_pybbqa, RBconstraint_list_SQSF, \
+                                      RBconstraint_list_DIRECT, RBconstraint_list_CUATROg, \
+                                      RBconstraint_list_Bayes])
 
-N_samples = 20
-RBnoiseSAA_list_pybbqa = []
-RBconstraintSAA_list_pybbqa = []
-for i in range(n_noise):
-    print('Iteration ', i, ' of Py-BOBYQA')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        sol = PyBobyqaWrapper().solve(f, x0, bounds=bounds.T, \
-                                      maxfun= max_f_eval, constraints=2, \
-                                      seek_global_minimum = True, \
-                                      objfun_has_noise = True)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoiseSAA_list_pybbqa.append(best)
-    RBconstraintSAA_list_pybbqa.append(best_constr)
-
-# N_SAA = 1
-N_samples = 20
-RBnoiseSAA_list_SQSF = []
-RBconstraintSAA_list_SQSF = []
-for i in range(n_noise):
-    print('Iteration ', i, ' of SQSnobfit')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        sol = SQSnobFitWrapper().solve(f, x0, bounds, \
-                                    maxfun = max_f_eval, constraints=2)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoiseSAA_list_SQSF.append(best)
-    RBconstraintSAA_list_SQSF.append(best_constr)
+    convergence = RBnoise_list_all.ravel()
+    constraints = RBconstraint_list_all.ravel()
+    noise = np.tile(np.repeat(noise, N_samples), len(method_names))
+    method = np.repeat(method_names, n_noise*N_samples)
+
+    data = {'Best function evaluation': convergence, \
+            "Constraint violation": constraints, \
+            "Noise standard deviation": noise, \
+            'Method': method}
+    df = pd.DataFrame(data)
+
+
+    plt.rcParams["font.family"] = "Times New Roman"
+    ft = int(15)
+    font = {'size': ft}
+    plt.rc('font', **font)
+    params = {'legend.fontsize': 12.5,
+                  'legend.handlelength': 1.2}
+    plt.rcParams.update(params)
+
+
+    plot_noise_study(df, 'Publication plots format/RB_feval100Convergence.svg', \
+                     'Publication plots format/RB_feval100Constraints.svg')
+
+
+    min_list = np.min(RBnoise_list_all, axis = (0, 2))
+
+    convergence_test = (RBnoise_list_all - min_list.reshape(1, n_noise, 1)).ravel()
     
-# N_SAA = 1
-N_samples = 20
-RBnoiseSAA_list_DIRECT = []
-RBconstraintSAA_list_DIRECT = []
-init_radius = 0.1
-boundsDIR = np.array([[-1.5,1],[-1,1.5]])
-for i in range(n_noise):
-    print('Iteration ', i, ' of DIRECT')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        DIRECT_f = lambda x, grad: f(x)
-        sol = DIRECTWrapper().solve(DIRECT_f, x0, boundsDIR, \
-                                    maxfun = max_f_eval, constraints=2)
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoiseSAA_list_DIRECT.append(best)
-    RBconstraintSAA_list_DIRECT.append(best_constr)
+
+    data_test = {'Best function evaluation': convergence_test, \
+                 "Constraint violation": constraints, \
+                 "Noise standard deviation": noise, \
+                 'Method': method}
+
+    df_test = pd.DataFrame(data_test)
     
-# N_SAA = 1
-N_samples = 20
-RBnoiseSAA_list_CUATROg = []
-RBconstraintSAA_list_CUATROg = []
-init_radius = 2
-for i in range(n_noise):
-    print('Iteration ', i, ' of CUATRO_g')
-    best = []
-    best_constr = []
-    for j in range(N_samples):
-        f = lambda x: Problem_rosenbrock(x, noise_matrix[i], N_SAA)
-        sol = CUATRO(f, x0, init_radius, bounds = bounds, max_f_eval = max_f_eval, \
-                          N_min_samples = 15, tolerance = 1e-10,\
-                          beta_red = 0.9, rnd = j, method = 'global', \
-                          constr_handling = 'Discrimination')
-        best.append(sol['f_best_so_far'][-1])
-        _, g = Problem_rosenbrock(sol['x_best_so_far'][-1], [0, 0, 0], N_SAA)
-        best_constr.append(np.sum(np.maximum(g, 0)))
-    RBnoiseSAA_list_CUATROg.append(best)
-    RBconstraintSAA_list_CUATROg.append(best_constr)
+    ax = sns.boxplot(x = "Noise standard deviation", y = 'Best function evaluation', hue = "Method", data = df_test, palette = "muted")
+    # plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
+    # plt.legend([])
+    plt.legend(bbox_to_anchor=(0,1.02,1,0.2), loc="lower left",
+                    mode="expand", borderaxespad=0, ncol=3)
+    plt.tight_layout()
+    plt.ylabel(r'$f_{best, sample}$ - $f_{opt, noise}$')
+    plt.savefig('Publication plots format/RB_feval100ConvergenceLabel.svg', format = "svg")
+    plt.show()
+    plt.clf()
+
+
+    max_f_eval = 50 ; N_SAA = 2
+    max_it = 100
+
+
+    RBnoiseSAA_list_pybbqa, RBconstraintSAA_list_pybbqa = run_noise_study('pybbqa', N_SAA, max_f_eval)
+    RBnoiseSAA_list_SQSF, RBconstraintSAA_list_SQSF = run_noise_study('SQSF', N_SAA, max_f_eval)
+    RBnoiseSAA_list_DIRECT, RBconstraintSAA_list_DIRECT = run_noise_study('DIRECT', N_SAA, max_f_eval)
+    RBnoiseSAA_list_CUATROg, RBconstraintSAA_list_CUATROg = run_noise_study('CUATROg', N_SAA, max_f_eval)
     
 
-with open('BayesRB_listNoiseConvSAA.pickle', 'rb') as handle:
-    RBnoiseSAA_list_Bayes = pickle.load(handle)
-    
-with open('BayesRB_listNoiseConstrSAA.pickle', 'rb') as handle:
-    RBconstraintSAA_list_Bayes = pickle.load(handle)
-
-
-noise = ['%.3f' % noise_matrix[i][0] for i in range(n_noise)]
-noise_labels = [[noise[i]]*N_samples for i in range(n_noise)]
-
-
-convergence = list(itertools.chain(*RBnoiseSAA_list_pybbqa)) + \
-              list(itertools.chain(*RBnoiseSAA_list_SQSF)) + \
-              list(itertools.chain(*RBnoiseSAA_list_DIRECT)) + \
-              list(itertools.chain(*RBnoiseSAA_list_CUATROg)) + \
-              list(itertools.chain(*RBnoiseSAA_list_Bayes))
-              
-constraints = list(itertools.chain(*RBconstraintSAA_list_pybbqa)) + \
-              list(itertools.chain(*RBconstraintSAA_list_SQSF)) + \
-              list(itertools.chain(*RBconstraintSAA_list_DIRECT)) + \
-              list(itertools.chain(*RBconstraintSAA_list_CUATROg)) + \
-              list(itertools.chain(*RBconstraintSAA_list_Bayes))   
-              
-noise = list(itertools.chain(*noise_labels))*5
-method = ['Py-BOBYQA']*int(len(noise)/5) + ['Snobfit']*int(len(noise)/5) + \
-          ['DIRECT']*int(len(noise)/5) + ['CUATRO_g']*int(len(noise)/5) + \
-           ['Bayes. Opt.']*int(len(noise)/5)   
-
-data = {'Best function evaluation': convergence, \
-        "Constraint violation": constraints, \
-        "Noise standard deviation": noise, \
-        'Method': method}
-df = pd.DataFrame(data)
-
-
-plt.rcParams["font.family"] = "Times New Roman"
-ft = int(15)
-font = {'size': ft}
-plt.rc('font', **font)
-params = {'legend.fontsize': 12.5,
-              'legend.handlelength': 1.2}
-plt.rcParams.update(params)
-
-plt.rcParams.update(params)
-
-ax = sns.boxplot(x = "Noise standard deviation", y = "Best function evaluation", hue = "Method", data = df, palette = "muted")
-# plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-plt.legend([])
-plt.tight_layout()
-plt.savefig('Publication plots format/RB_SAA2feval50Convergence.svg', format = "svg")
-plt.show()
-# ax.set_ylim([0.1, 10])
-# ax.set_yscale("log")
-plt.clf()
-
-min_list = np.array([np.min([np.min(RBnoiseSAA_list_pybbqa[i]), 
-                  np.min(RBnoiseSAA_list_SQSF[i]),
-                  np.min(RBnoiseSAA_list_DIRECT[i]), 
-                  np.min(RBnoiseSAA_list_CUATROg[i]), 
-                  np.min(RBnoiseSAA_list_Bayes[i])]) for i in range(n_noise)])
-
-convergence_test = list(itertools.chain(*np.array(RBnoiseSAA_list_pybbqa) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoiseSAA_list_SQSF) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoiseSAA_list_DIRECT) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoiseSAA_list_CUATROg) - min_list.reshape(6,1))) + \
-              list(itertools.chain(*np.array(RBnoiseSAA_list_Bayes) - min_list.reshape(6,1)))
+    with open('BayesRB_listNoiseConvSAA.pickle', 'rb') as handle:
+        RBnoiseSAA_list_Bayes = pickle.load(handle)
     
+    with open('BayesRB_listNoiseConstrSAA.pickle', 'rb') as handle:
+        RBconstraintSAA_list_Bayes = pickle.load(handle)
 
-data_test = {'Best function evaluation': convergence_test, \
-             "Constraint violation": constraints, \
-             "Noise standard deviation": noise, \
-             'Method': method}
 
-df_test = pd.DataFrame(data_test)
-    
-ax = sns.boxplot(x = "Noise standard deviation", y = 'Best function evaluation', hue = "Method", data = df_test, palette = "muted")
-# plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-# plt.legend([])
-plt.legend(bbox_to_anchor=(0,1.02,1,0.2), loc="lower left",
-                mode="expand", borderaxespad=0, ncol=3)
-plt.tight_layout()
-plt.ylabel(r'$f_{best, sample}$ - $f_{opt, noise}$')
-plt.savefig('Publication plots format/RB_SAA2feval50ConvergenceLabel.svg', format = "svg")
-plt.show()
-plt.clf()
+    noise = ['%.3f' % noise_matrix[i][0] for i in range(n_noise)]
 
+    # shape (method, noise level, sample), flattened in that order below
+    RBnoiseSAA_list_all = np.array([RBnoiseSAA_list_pybbqa, RBnoiseSAA_list_SQSF, \
+                                    RBnoiseSAA_list_DIRECT, RBnoiseSAA_list_CUATROg, \
+                                    RBnoiseSAA_list_Bayes])
+    RBconstraintSAA_list_all = np.array([RBconstraintSAA_list_pybbqa, RBconstraintSAA_list_SQSF, \
+                                         RBconstraintSAA_list_DIRECT, RBconstraintSAA_list_CUATROg, \
+                                         RBconstraintSAA_list_Bayes])
 
+    convergence = RBnoiseSAA_list_all.ravel()
+    constraints = RBconstraintSAA_list_all.ravel()
+    noise = np.tile(np.repeat(noise, N_samples), len(method_names))
+    method = np.repeat(method_names, n_noise*N_samples)
 
+    data = {'Best function evaluation': convergence, \
+            "Constraint violation": constraints, \
+            "Noise standard deviation": noise, \
+            'Method': method}
+    df = pd.DataFrame(data)
 
 
-ax = sns.boxplot(x = "Noise standard deviation", y = "Constraint violation", \
-                    hue = "Method", data = df, palette = "muted", fliersize = 0)
-ax = sns.stripplot(x = "Noise standard deviation", y = "Constraint violation", \
-                    hue = "Method", data = df, palette = "muted", dodge = True)
-plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
-plt.tight_layout()
-plt.savefig('Publication plots format/RB_SAA2feval50Constraints.svg', format = "svg")
-plt.show()
-plt.clf()
+    plt.rcParams["font.family"] = "Times New Roman"
+    ft = int(15)
+    font = {'size': ft}
+    plt.rc('font', **font)
+    params = {'legend.fontsize': 12.5,
+                  'legend.handlelength': 1.2}
+    plt.rcParams.update(params)
 
+    plt.rcParams.update(params)
+
+    plot_noise_study(df, 'Publication plots format/RB_SAA2feval50Convergence.svg', \
+                     'Publication plots format/RB_SAA2feval50Constraints.svg')
+
+    min_list = np.min(RBnoiseSAA_list_all, axis = (0, 2))
+
+    convergence_test = (RBnoiseSAA_list_all - min_list.reshape(1, n_noise, 1)).ravel()
+    
+
+    data_test = {'Best function evaluation': convergence_test, \
+                 "Constraint violation": constraints, \
+                 "Noise standard deviation": noise, \
+                 'Method': method}
+
+    df_test = pd.DataFrame(data_test)
+    
+    ax = sns.boxplot(x = "Noise standard deviation", y = 'Best function evaluation', hue = "Method", data = df_test, palette = "muted")
+    # plt.legend(bbox_to_anchor=(1.04,1), loc="upper left")
+    # plt.legend([])
+    plt.legend(bbox_to_anchor=(0,1.02,1,0.2), loc="lower left",
+                    mode="expand", borderaxespad=0, ncol=3)
+    plt.tight_layout()
+    plt.ylabel(r'$f_{best, sample}$ - $f_{opt, noise}$')
+    plt.savefig('Publication plots format/RB_SAA2feval50ConvergenceLabel.svg', format = "svg")
+    plt.show()
+    plt.clf()
 
 
@@ -49,10 +49,8 @@ class PenaltyFunctions_NLopt:
         else:
             self.f_his += [obj.copy()]
         n_con = card_of_funcs-1
-        g_tot = np.zeros(n_con)
-        for i in range(n_con):
-            g_tot[i] = funcs[1][i]
-            obj += mu * max(g_tot[i], 0) ** order
+        g_tot = np.asarray(funcs[1], dtype=float).reshape(n_con)
+        obj += mu * np.sum(np.maximum(g_tot, 0) ** order)
         self.g_his += [g_tot]
         self.x_his += [x.tolist().copy()]
         return obj
@@ -96,11 +94,12 @@ class PenaltyFunctions_NLopt:
 class DIRECTWrapper:
     __metaclass__ = nlopt.opt
     def __init__(self):
-        self.opt = nlopt.opt
+        self.opt_class = nlopt.opt
 
     def solve(self, objfun, x0, bounds, maxfun=100, 
               constraints =0, penalty_con='l2', mu_con=1e3):
-        self.opt = self.opt(nlopt.GN_DIRECT_L_RAND, len(x0))
+        # fresh optimiser per solve, so the wrapper can be reused
+        self.opt = self.opt_class(nlopt.GN_DIRECT_L_RAND, len(x0))
         self.maxfun = maxfun
         if (constraints)==0:#constraints==None:
             self.card_of_funcs = 1
@@ -3,7 +3,6 @@ import matplotlib.pyplot as plt
 
 import numpy as np
 
-from algorithms.Bayesian_opt_Pyro.utilities_full import BayesOpt
 from test_functions import rosenbrock_constrained, quadratic_constrained
 
 from utilities.general_utility_functions import PenaltyFunctions
@@ -1,39 +1,105 @@
 import numpy as np 
+import bisect
 # import sys
 # sys.path.insert(1, 'utilities')
 from utilities.general_utility_functions import PenaltyFunctions
 
 def project_to_bounds(x, bounds):
-    node = x
-    for j in range(len(x)):
-        if node[j] < bounds[j,0]:
-            node[j] = bounds[j,0]
-        if node[j] > bounds[j,1]:
-            node[j] = bounds[j,1]
-    return node
+    # clipped in place, as the nodes are updated by reference
+    return np.clip(x, bounds[:,0], bounds[:,1], out=x)
+
+def simplex_centroid(x_sum, x_worst, d, out):
+    # centroid of all bar worst node, from the running sum of the nodes
+    np.subtract(x_sum, x_worst, out=out)
+    out /= d
+    return out
+
+def replace_worst(x_nodes, f_nodes, sorted_nodes, f_sorted, x_sum, x_new, f_new):
+    '''
+    Replaces the worst node by (x_new, f_new) and re-inserts it in the
+    ordering, so the nodes never need to be fully re-sorted.
+    '''
+    worst = sorted_nodes.pop()
+    f_sorted.pop()
+    x_sum -= x_nodes[worst,:]
+    x_sum += x_new
+    x_nodes[worst,:] = x_new
+    f_nodes[worst] = f_new
+    pos = bisect.bisect_right(f_sorted, f_new)
+    sorted_nodes.insert(pos, worst)
+    f_sorted.insert(pos, f_new)
+
+def simplex_move(centroid, x, coeff, out):
+    # reflection (coeff=-1), expansion (coeff=2) and contraction (coeff=0.5)
+    np.subtract(x, centroid, out=out)
+    out *= coeff
+    out += centroid
+    return out
+
+# d = 2 versions of the above on Python floats, for the 2-D test problems,
+# where the numpy call overhead outweighs the arithmetic. bounds is then
+# given as a nested list.
+def project_to_bounds_d2(x, bounds):
+    x0, x1 = x.tolist()
+    (l0, u0), (l1, u1) = bounds
+    x[0] = min(max(x0, l0), u0)
+    x[1] = min(max(x1, l1), u1)
+    return x
+
+def simplex_centroid_d2(x_sum, x_worst, d, out):
+    s0, s1 = x_sum.tolist()
+    w0, w1 = x_worst.tolist()
+    out[0] = (s0 - w0)/d
+    out[1] = (s1 - w1)/d
+    return out
+
+def simplex_move_d2(centroid, x, coeff, out):
+    c0, c1 = centroid.tolist()
+    x0, x1 = x.tolist()
+    out[0] = (x0 - c0)*coeff + c0
+    out[1] = (x1 - c1)*coeff + c1
+    return out
 
 def extract_best(x_store, f_store, g_store, samples_at_iteration):
-    N_f = len(f_store)
-    _, N_x = x_store.shape
-    _, N_g = g_store.shape
-    N_it = len(samples_at_iteration)
-    x_best = np.zeros((N_it, N_x))
-    f_best = np.zeros(N_it)
-    g_best = np.zeros((N_it, N_g))
-    for i in range(N_it):
-        nbr_samples = samples_at_iteration[i]
-        feas = np.product((np.array(g_store[:int(nbr_samples)]) <= 0).astype(int), axis = 1)
-        idx = np.where(f_store == np.min(f_store[:int(nbr_samples)][feas == 1]))
-        # print(idx)
-        f_best[i] = f_store[idx[0][0]]     # initialising function store
-        x_best[i] = x_store[idx[0][0]]
-        g_best[i] = g_store[idx[0][0]]
-    return x_best, f_best, g_best
+    # running minimum over the feasible evaluations, read off after each
+    # iteration's number of samples
+    feas = np.all(g_store <= 0, axis = 1)
+    f_feas = np.where(feas, f_store, np.inf)
+    f_min = np.minimum.accumulate(f_feas)
+    # index of the first evaluation reaching each running minimum
+    improved = f_feas < np.concatenate(([np.inf], f_min[:-1]))
+    best_idx = np.maximum.accumulate(np.where(improved, np.arange(len(f_store)), 0))
+    # the initial nodes are counted in the samples but not stored, so clamp
+    # to the store as the slice f_store[:nbr_samples] did
+    last = np.minimum(samples_at_iteration.astype(int), len(f_store)) - 1
+    if not np.all(np.isfinite(f_min[last])):
+        raise ValueError('No feasible point among the stored evaluations')
+    idx = best_idx[last]
+    return x_store[idx], f_store[idx], g_store[idx]
+
+
+class _Cache:
+    '''
+    Memoizes a black-box function on the bytes of x, so that re-querying a
+    node (e.g. logging the best node) does not trigger a new evaluation.
+    n_evals counts the actual (non-cached) evaluations.
+    '''
+    def __init__(self, fn):
+        self.fn = fn
+        self.cache = {}
+        self.n_evals = 0
+
+    def __call__(self, x):
+        key = np.asarray(x, dtype=float).tobytes()
+        if key not in self.cache:
+            self.cache[key] = self.fn(x)
+            self.n_evals += 1
+        return self.cache[key]
     
 
 
 def simplex_method(f,x0,bounds,max_iter,constraints, max_f_eval = 100, \
-                   mu_con = 1e3, rnd_seed = 0, initialisation = 0.1):
+                   mu_con = 1e3, rnd_seed = 0, initialisation = 0.1, rng = None):
     '''
     INPUTS
     ------------------------------------
@@ -48,6 +114,10 @@ def simplex_method(f,x0,bounds,max_iter,constraints, max_f_eval = 100, \
                 no stopping conditions
     
     constraints: the number of constraints
+    
+    rng:        numpy Generator for the initial simplex, if not given
+                np.random.default_rng(rnd_seed) is used and the global
+                np.random state is seeded with rnd_seed
                 
     OUTPUTS
     ------------------------------------
@@ -72,23 +142,28 @@ def simplex_method(f,x0,bounds,max_iter,constraints, max_f_eval = 100, \
      - Stored function values at each iteration are not the penalised objective
         but the objective function itself.
     '''
-    np.random.seed(rnd_seed)
+    if rng is None:
+        # the global state is reseeded too, as noisy objectives of the
+        # comparison scripts draw from np.random and rely on rnd_seed
+        np.random.seed(rnd_seed)
+        rng = np.random.default_rng(rnd_seed)
     
-    f_aug = PenaltyFunctions(f,type_penalty='l2', mu= mu_con)
+    f_cached = _Cache(f)
+    f_aug = PenaltyFunctions(f_cached,type_penalty='l2', mu= mu_con)
     
     bounds = np.array(bounds)   # converting to numpy if not 
     d = len(x0)                 # dimension 
     con_d = constraints
     f_range = (bounds[:,1] - bounds[:,0])*initialisation # range of initial simplex
-    x_nodes = np.random.normal(x0,f_range,(d+1,d))  # creating nodes
-    f_nodes = np.zeros((len(x_nodes[:,0]),1))       # function value at each node
+    x_nodes = rng.normal(x0,f_range,(d+1,d))        # creating nodes
+    f_nodes = np.zeros(d+1)                         # function value at each node
     f_eval_count = 0            # initialising total function evaluation counter
-    f_store = np.zeros(max_iter)            # initialising function store
-    g_store = np.zeros((max_iter,con_d))
-    x_store = np.zeros((max_iter,d))        # initialising x_store
-    f_best_so_far = np.zeros(max_iter)      # initialising function store
-    x_best_so_far = np.zeros((max_iter,d))
-    g_best_so_far = np.zeros((max_iter,con_d))
+    # at most 3 stored evaluations per iteration (best node, reflection and
+    # expansion or contraction), n_store of them are filled in
+    f_store = np.zeros(3*max_iter)          # initialising function store
+    g_store = np.zeros((3*max_iter,con_d))
+    x_store = np.zeros((3*max_iter,d))      # initialising x_store
+    n_store = 0
     nbr_samples = np.zeros(max_iter)
 
     for i in range(len(x_nodes)):
@@ -98,97 +173,88 @@ def simplex_method(f,x0,bounds,max_iter,constraints, max_f_eval = 100, \
 
     # evaluating function 
     for i in range(d+1):
-        f_nodes[i,:] = f_aug.aug_obj(x_nodes[i,:])  
-        f_eval_count += 1 
-        
+        f_nodes[i] = f_aug.aug_obj(x_nodes[i,:])  
+    f_eval_count = f_cached.n_evals
+    # node ordering and node sum are updated incrementally from here on
+    sorted_nodes = list(np.argsort(f_nodes))
+    f_sorted = list(f_nodes[sorted_nodes])
+    x_sum = np.sum(x_nodes, axis=0)
+    # scalar simplex moves for 2-D problems
+    if d == 2:
+        centroid_fn, move_fn, project_fn = simplex_centroid_d2, \
+            simplex_move_d2, project_to_bounds_d2
+        bounds_step = bounds.tolist()
+    else:
+        centroid_fn, move_fn, project_fn = simplex_centroid, \
+            simplex_move, project_to_bounds
+        bounds_step = bounds
+    # scratch buffers for the simplex moves, reused at every iteration
+    centroid = np.empty(d)
+    x_reflected = np.empty(d)
+    x_expanded = np.empty(d)
+    x_contracted = np.empty(d)
     
     for its in range(max_iter):
         
-
-        
-        sorted_nodes = np.argsort(f_nodes[:,0])
-        best_nodes = x_nodes[sorted_nodes[:-1]]
-        
         best_node = x_nodes[sorted_nodes[0]]
         f_evalled = f_aug.f(best_node)
-        f_eval_count += 1
         # storing important quantities
-        if its == 0:
-            x_store = [best_node]
-            f_store = [f_evalled[0]]
-            g_store = [f_evalled[1]]
-        else:
-            x_store = np.append(x_store,[best_node],axis=0)
-            f_store = np.append(f_store,f_evalled[0])
-            g_store = np.append(g_store,[f_evalled[1]],axis=0)
-
-        
-        if its == 0:
-            f_best_so_far[its] = f_store[its] 
-            x_best_so_far[its] = x_store[its]
-            g_best_so_far[its] = g_store[its]
-        else:
-            f_best_so_far[its] = f_store[its] 
-            x_best_so_far[its] = best_node
-            g_best_so_far[its] = g_store[its]
-            if f_best_so_far[its] > f_best_so_far[its-1]:
-                f_best_so_far[its] = f_best_so_far[its-1]
-                x_best_so_far[its] = x_best_so_far[its-1]
-                g_best_so_far[its] = g_best_so_far[its-1]
+        x_store[n_store] = best_node
+        f_store[n_store] = f_evalled[0]
+        g_store[n_store] = f_evalled[1]
+        n_store += 1
 
         # centroid of all bar worst nodes
-        centroid = np.mean(best_nodes,axis=0)
+        centroid_fn(x_sum, x_nodes[sorted_nodes[-1],:], d, centroid)
         # reflection of worst node
-        x_provis = centroid + (centroid - x_nodes[sorted_nodes[-1],:])
-        x_reflected = project_to_bounds(x_provis, bounds) 
-        f_reflected =  f_aug.aug_obj(x_reflected) 
-        # adding hypothesised function eval (have to re-eval to get f,g separate?)
-        f_total_func = f_aug.f(x_reflected)
-        x_store = np.append(x_store,[x_reflected],axis=0)
-        f_store = np.append(f_store,f_total_func[0])
-        g_store = np.append(g_store,[f_total_func[1]],axis=0)
-
-        f_eval_count += 1 
+        move_fn(centroid, x_nodes[sorted_nodes[-1],:], -1, x_reflected)
+        project_fn(x_reflected, bounds_step) 
+        f_val, g_val, f_reflected = f_aug.eval_all(x_reflected)
+        # adding hypothesised function eval
+        x_store[n_store] = x_reflected
+        f_store[n_store] = f_val
+        g_store[n_store] = g_val
+        n_store += 1
+
         # accept reflection? 
-        if f_reflected < f_nodes[sorted_nodes[-2]] and \
-            f_reflected > f_nodes[sorted_nodes[0]]:
-                x_nodes[sorted_nodes[-1],:] = x_reflected
-                f_nodes[sorted_nodes[-1],:] = f_reflected
+        if f_reflected < f_sorted[-2] and \
+            f_reflected > f_sorted[0]:
+                replace_worst(x_nodes, f_nodes, sorted_nodes, f_sorted, x_sum, \
+                              x_reflected, f_reflected)
         # try expansion of reflected then accept? 
-        elif f_reflected < f_nodes[sorted_nodes[0]]:
-                x_provis =   centroid + 2*(x_reflected-centroid)
-                x_expanded = project_to_bounds(x_provis, bounds) 
-                f_expanded = f_aug.aug_obj(x_expanded)
-
-                # adding hypothesised function eval (have to re-eval to get f,g separate?)
-                f_total_func = f_aug.f(x_expanded)
-                x_store = np.append(x_store,[x_expanded],axis=0)
-                f_store = np.append(f_store,f_total_func[0])
-                g_store = np.append(g_store,[f_total_func[1]],axis=0)
-
-                f_eval_count += 1 
+        elif f_reflected < f_sorted[0]:
+                move_fn(centroid, x_reflected, 2, x_expanded)
+                project_fn(x_expanded, bounds_step) 
+                f_val, g_val, f_expanded = f_aug.eval_all(x_expanded)
+
+                # adding hypothesised function eval
+                x_store[n_store] = x_expanded
+                f_store[n_store] = f_val
+                g_store[n_store] = g_val
+                n_store += 1
+
                 if f_expanded < f_reflected:
-                    x_nodes[sorted_nodes[-1],:] = x_expanded
-                    f_nodes[sorted_nodes[-1],:] = f_expanded
+                    replace_worst(x_nodes, f_nodes, sorted_nodes, f_sorted, x_sum, \
+                                  x_expanded, f_expanded)
                 else: # ...expansion worse so accept reflection 
-                    x_nodes[sorted_nodes[-1],:] = x_reflected
-                    f_nodes[sorted_nodes[-1],:] = f_reflected
+                    replace_worst(x_nodes, f_nodes, sorted_nodes, f_sorted, x_sum, \
+                                  x_reflected, f_reflected)
         else: # all else fails, contraction of worst internal of simplex
-            x_provis = centroid + 0.5*(x_nodes[sorted_nodes[-1],:]-centroid) 
-            x_contracted = project_to_bounds(x_provis, bounds) 
-            f_contracted = f_aug.aug_obj(x_contracted)
-
-            # adding hypothesised function eval (have to re-eval to get f,g separate?)
-            f_total_func = f_aug.f(x_contracted)
-            x_store = np.append(x_store,[x_contracted],axis=0)
-            f_store = np.append(f_store,f_total_func[0])
-            g_store = np.append(g_store,[f_total_func[1]],axis=0)
-
-            f_eval_count += 1
-            if f_contracted < f_nodes[sorted_nodes[-1]]:
-                x_nodes[sorted_nodes[-1],:] = x_contracted
-                f_nodes[sorted_nodes[-1],:] = f_contracted
+            move_fn(centroid, x_nodes[sorted_nodes[-1],:], 0.5, x_contracted)
+            project_fn(x_contracted, bounds_step) 
+            f_val, g_val, f_contracted = f_aug.eval_all(x_contracted)
+
+            # adding hypothesised function eval
+            x_store[n_store] = x_contracted
+            f_store[n_store] = f_val
+            g_store[n_store] = g_val
+            n_store += 1
+
+            if f_contracted < f_sorted[-1]:
+                replace_worst(x_nodes, f_nodes, sorted_nodes, f_sorted, x_sum, \
+                              x_contracted, f_contracted)
              
+        f_eval_count = f_cached.n_evals
         nbr_samples[its] = f_eval_count
         # for i in range(len(x_nodes)):
         #     node = x_nodes[i,:]
@@ -202,6 +268,9 @@ def simplex_method(f,x0,bounds,max_iter,constraints, max_f_eval = 100, \
             break
         
    # computing final constraint violation 
+    x_store = x_store[:n_store]
+    f_store = f_store[:n_store]
+    g_store = g_store[:n_store]
     output_dict = {}
     output_dict['g_store'] = g_store
     output_dict['x_store'] = x_store
@@ -11,6 +11,8 @@ Montreal, Canada. pp. 891–897. Retrieved 7 January 2017.
 def rosenbrock_f(x):
     '''
     Unconstrained Rosenbrock function (objective)
+    x may also be a (2, n) array of n points, one per column,
+    in which case n values are returned
     '''
     return (1 - x[0])**2 + 100*(x[1] - x[0]**2)**2
 
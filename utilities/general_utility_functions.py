@@ -23,6 +23,7 @@ class PenaltyFunctions:
 
         self.f_his = []
         self.g_his = []
+        self._last = None
 
         self.type_p = type_penalty
         self.aug_obj = self.augmented_objective(mu)
@@ -37,13 +38,28 @@ class PenaltyFunctions:
         else:
             self.f_his += [obj.copy()]
         n_con = card_of_funcs-1
-        g_tot = np.zeros(n_con)
-        for i in range(n_con):
-            g_tot[i] = funcs[1][i]
-            obj += mu * max(g_tot[i], 0) ** order
+        g_tot = np.asarray(funcs[1], dtype=float).reshape(n_con)
+        f_val = obj
+        obj = obj + mu * np.sum(np.maximum(g_tot, 0) ** order)
         self.g_his += [g_tot]
+        self._last = (np.asarray(x, dtype=float).tobytes(), f_val, g_tot, obj)
         return obj
 
+    def eval_all(self, x):
+        """
+        Objective, constraints and penalized objective from a single call of
+        f. Asking again for the last evaluated x does not call f again.
+
+        :param x: The point to evaluate
+        :type x: array
+        :return:  f_val, g_val, obj_aug
+        :rtype:   tuple
+        """
+        if self._last is None or \
+            self._last[0] != np.asarray(x, dtype=float).tobytes():
+            self.aug_obj(x)
+        return self._last[1:]
+
     def augmented_objective(self, mu):
         """
 